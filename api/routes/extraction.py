@@ -1,8 +1,8 @@
 """
 Extraction endpoints
 """
-from fastapi import APIRouter, HTTPException, BackgroundTasks
-from pydantic import BaseModel
+from fastapi import APIRouter, HTTPException, BackgroundTasks, Depends, Request
+from pydantic import BaseModel, Field, conlist
 from typing import Optional
 import logging
 
@@ -12,12 +12,17 @@ logger = logging.getLogger(__name__)
 router = APIRouter()
 
 
+def get_extraction_service(request: Request) -> ExtractionService:
+    """Return the application-wide extraction service created at startup"""
+    return request.app.state.extraction_service
+
+
 class ExtractionRequest(BaseModel):
     """Request model for starting an extraction"""
     access_token: str
     tenant_id: Optional[str] = "default"
-    limit: Optional[int] = 100
-    properties: Optional[list[str]] = None
+    limit: Optional[int] = Field(default=100, ge=1, le=100)
+    properties: Optional[conlist(str, max_length=128)] = None
 
 
 class ExtractionResponse(BaseModel):
@@ -36,10 +41,13 @@ class ScanStatusResponse(BaseModel):
 
 
 @router.post("/extractions", response_model=ExtractionResponse)
-async def start_extraction(request: ExtractionRequest, background_tasks: BackgroundTasks):
+async def start_extraction(
+    request: ExtractionRequest,
+    background_tasks: BackgroundTasks,
+    extraction_service: ExtractionService = Depends(get_extraction_service)
+):
     """Start a new extraction scan"""
     try:
-        extraction_service = ExtractionService()
         scan_id = await extraction_service.start_extraction(
             access_token=request.access_token,
             tenant_id=request.tenant_id,
@@ -47,7 +55,8 @@ async def start_extraction(request: ExtractionRequest, background_tasks: Backgro
             properties=request.properties
         )
         
-        return ExtractionResponse(
+        # Built from trusted internal values, so skip field validation
+        return ExtractionResponse.model_construct(
             scan_id=scan_id,
             status="started",
             message=f"Extraction started with scan_id: {scan_id}"
@@ -58,23 +67,29 @@ async def start_extraction(request: ExtractionRequest, background_tasks: Backgro
 
 
 @router.get("/extractions/{scan_id}/status", response_model=ScanStatusResponse)
-async def get_extraction_status(scan_id: str):
+async def get_extraction_status(
+    scan_id: str,
+    extraction_service: ExtractionService = Depends(get_extraction_service)
+):
     """Get the status of an extraction scan"""
     try:
-        extraction_service = ExtractionService()
         status = await extraction_service.get_extraction_status(scan_id)
         
-        return ScanStatusResponse(**status)
+        return ScanStatusResponse.model_construct(**status)
     except Exception as e:
         logger.error(f"Error getting extraction status: {str(e)}")
         raise HTTPException(status_code=500, detail=str(e))
 
 
 @router.get("/extractions/{scan_id}/results")
-async def get_extraction_results(scan_id: str, limit: int = 100, offset: int = 0):
+async def get_extraction_results(
+    scan_id: str,
+    limit: int = 100,
+    offset: int = 0,
+    extraction_service: ExtractionService = Depends(get_extraction_service)
+):
     """Get results from a completed extraction"""
     try:
-        extraction_service = ExtractionService()
         results = await extraction_service.get_extraction_results(
             scan_id=scan_id,
             limit=limit,
@@ -1,36 +1,35 @@
 """
 Health check endpoints
 """
-from fastapi import APIRouter
-from datetime import datetime
+from fastapi import APIRouter, Request
 
 router = APIRouter()
 
 
 @router.get("")
-async def health_check():
+async def health_check(request: Request):
     """Health check endpoint"""
     return {
         "status": "healthy",
-        "timestamp": datetime.utcnow().isoformat(),
+        "timestamp": request.app.state.now_iso,
         "service": "hubspot_deals_etl"
     }
 
 
 @router.get("/ready")
-async def readiness_check():
+async def readiness_check(request: Request):
     """Readiness check endpoint"""
     return {
         "status": "ready",
-        "timestamp": datetime.utcnow().isoformat()
+        "timestamp": request.app.state.now_iso
     }
 
 
 @router.get("/live")
-async def liveness_check():
+async def liveness_check(request: Request):
     """Liveness check endpoint"""
     return {
         "status": "alive",
-        "timestamp": datetime.utcnow().isoformat()
+        "timestamp": request.app.state.now_iso
     }
 
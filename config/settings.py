@@ -1,6 +1,8 @@
 """
 Application settings and configuration
 """
+from functools import lru_cache
+from pydantic import computed_field
 from pydantic_settings import BaseSettings
 from typing import Optional
 
@@ -28,22 +30,30 @@ class Settings(BaseSettings):
     db_user: str = "user"
     db_password: str = "password"
     
+    # Redis Configuration (extraction status store)
+    redis_url: str = "redis://localhost:6379/0"
+    extraction_status_ttl: int = 86400  # seconds
+    extraction_shutdown_timeout: int = 30  # seconds to let a running load finish
+    
     # Service Configuration
     service_port: int = 5200
     log_level: str = "INFO"
     
+    @computed_field
+    @property
+    def resolved_database_url(self) -> str:
+        """Database URL, built from the individual DB settings if not set"""
+        return self.database_url or (
+            f"postgresql://{self.db_user}:{self.db_password}"
+            f"@{self.db_host}:{self.db_port}/{self.db_name}"
+        )
+    
     class Config:
         env_file = ".env"
         case_sensitive = False
 
 
-_settings: Optional[Settings] = None
-
-
+@lru_cache(maxsize=1)
 def get_settings() -> Settings:
     """Get application settings (singleton)"""
-    global _settings
-    if _settings is None:
-        _settings = Settings()
-    return _settings
-
+    return Settings()
@@ -3,11 +3,15 @@ Main FastAPI application for HubSpot Deals ETL Service
 """
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
-from contextlib import asynccontextmanager
+from contextlib import asynccontextmanager, suppress
+from datetime import datetime
+from redis.asyncio import Redis
+import asyncio
 import logging
 
 from api.routes import extraction, health
 from config.settings import get_settings
+from services.extraction_service import ExtractionService
 
 # Configure logging
 logging.basicConfig(
@@ -19,12 +23,28 @@ logger = logging.getLogger(__name__)
 settings = get_settings()
 
 
+async def _refresh_timestamp(app: FastAPI):
+    """Refresh the cached ISO timestamp served by the health endpoints"""
+    while True:
+        app.state.now_iso = datetime.utcnow().isoformat()
+        await asyncio.sleep(1)
+
+
 @asynccontextmanager
 async def lifespan(app: FastAPI):
     """Application lifespan events"""
     logger.info("Starting HubSpot Deals ETL Service...")
+    app.state.now_iso = datetime.utcnow().isoformat()
+    clock_task = asyncio.create_task(_refresh_timestamp(app))
+    app.state.redis = Redis.from_url(settings.redis_url)
+    app.state.extraction_service = ExtractionService(redis=app.state.redis)
     yield
     logger.info("Shutting down HubSpot Deals ETL Service...")
+    clock_task.cancel()
+    with suppress(asyncio.CancelledError):
+        await clock_task
+    await app.state.extraction_service.aclose()
+    await app.state.redis.aclose()
 
 
 app = FastAPI(
@@ -3,27 +3,54 @@ DLT Data Source for HubSpot Deals
 """
 import dlt
 import logging
-import asyncio
+from contextlib import aclosing
+import pyarrow as pa
 from typing import Iterator, Dict, Any, Optional, List
-from datetime import datetime
-import uuid
+from datetime import datetime, timedelta, timezone
 
 from services.hubspot_api_service import HubSpotAPIService
+from utils.identifiers import uuid7
 
 logger = logging.getLogger(__name__)
 
+_EPOCH = datetime(1970, 1, 1, tzinfo=timezone.utc)
+_TIMESTAMP = pa.timestamp("ms", tz="UTC")
+
+# Fixed deal columns; deal_id is the merge key and never null
+_DEAL_FIELDS = [
+    pa.field("deal_id", pa.string(), nullable=False),
+    pa.field("tenant_id", pa.string()),
+    pa.field("scan_id", pa.string()),
+    pa.field("extracted_at", _TIMESTAMP),
+    pa.field("deal_name", pa.string()),
+    pa.field("amount", pa.float64()),
+    pa.field("deal_stage", pa.string()),
+    pa.field("pipeline", pa.string()),
+    pa.field("close_date", pa.string()),
+    pa.field("description", pa.string()),
+    pa.field("deal_type", pa.string()),
+    pa.field("created_at", _TIMESTAMP),
+    pa.field("updated_at", _TIMESTAMP),
+    pa.field("archived", pa.bool_()),
+]
+
+# Raw properties are stored the way DLT flattens a nested dict
+_PROPERTIES_PREFIX = "properties_json__"
+
 
 @dlt.resource(
     name="deals",
     write_disposition="merge",
     primary_key="deal_id"
 )
-def hubspot_deals_resource(
+async def hubspot_deals_resource(
     access_token: str,
     tenant_id: str = "default",
     properties: Optional[List[str]] = None,
     archived: bool = False,
-    checkpoint_interval: int = 10
+    checkpoint_interval: int = 10,
+    scan_id: Optional[str] = None,
+    page_size: int = 100
 ):
     """
     DLT resource for HubSpot deals
@@ -34,138 +61,176 @@ def hubspot_deals_resource(
         properties: List of deal properties to retrieve
         archived: Whether to include archived deals
         checkpoint_interval: Number of pages between checkpoints
+        scan_id: Extraction scan identifier (generated if not provided)
+        page_size: Number of deals requested per HubSpot page (max: 100)
     
     Yields:
         Deal records with ETL metadata
     """
     api_service = HubSpotAPIService(access_token)
-    scan_id = str(uuid.uuid4())
+    scan_id = scan_id or str(uuid7())
     page_count = 0
     
     logger.info(f"Starting deals extraction - scan_id: {scan_id}, tenant_id: {tenant_id}")
     
-    async def _async_generator():
-        """Async generator that fetches deals"""
-        async for page_data in api_service.get_all_deals(
-            properties=properties,
-            archived=archived
-        ):
-            yield page_data
-    
     try:
-        # Run async generator in sync context
-        loop = asyncio.new_event_loop()
-        asyncio.set_event_loop(loop)
-        
-        try:
-            async_gen = _async_generator()
-            
-            while True:
-                try:
-                    page_data = loop.run_until_complete(async_gen.__anext__())
-                    
-                    results = page_data.get("results", [])
-                    
-                    for deal in results:
-                        # Transform HubSpot deal to our schema
-                        deal_record = transform_deal_record(
-                            deal=deal,
-                            scan_id=scan_id,
-                            tenant_id=tenant_id
-                        )
-                        yield deal_record
-                    
-                    page_count += 1
-                    
-                    # Create checkpoint every N pages
-                    if page_count % checkpoint_interval == 0:
-                        logger.info(f"Checkpoint: Processed {page_count} pages")
-                        # DLT will handle checkpointing automatically
-                    
-                    # Log progress
-                    if page_count % 10 == 0:
-                        logger.info(f"Extracted {page_count} pages of deals")
-                        
-                except StopAsyncIteration:
-                    break
-                    
-        finally:
-            loop.close()
+        # aclosing cancels the prefetch producer before the client is closed
+        async with aclosing(api_service.get_all_deals(
+            properties=properties,
+            archived=archived,
+            page_size=page_size
+        )) as pages:
+            async for page_data in pages:
+                results = page_data.get("results", [])
+                
+                # Transform the page to an Arrow table and hand it to DLT as one batch
+                if results:
+                    yield transform_deal_page(
+                        deals=results,
+                        scan_id=scan_id,
+                        tenant_id=tenant_id
+                    )
+                
+                page_count += 1
+                
+                # Create checkpoint every N pages
+                if page_count % checkpoint_interval == 0:
+                    logger.info(f"Checkpoint: Processed {page_count} pages")
+                    # DLT will handle checkpointing automatically
+                
+                # Log progress
+                if page_count % 10 == 0:
+                    logger.info(f"Extracted {page_count} pages of deals")
         
         logger.info(f"Extraction completed - scan_id: {scan_id}, pages: {page_count}")
         
     except Exception as e:
         logger.error(f"Error in deals extraction: {str(e)}")
         raise
+    finally:
+        await api_service.aclose()
 
 
-def transform_deal_record(
-    deal: Dict[str, Any],
-    scan_id: str,
-    tenant_id: str
-) -> Dict[str, Any]:
+def parse_hubspot_timestamp(value: Any) -> Optional[datetime]:
     """
-    Transform HubSpot deal to our database schema
+    Parse a HubSpot timestamp property
+    
+    CRM v3 returns ISO 8601 strings, while older payloads use epoch
+    milliseconds. Millisecond values are added to a fixed UTC epoch, which
+    avoids the float division and local-time lookup of fromtimestamp.
     
     Args:
-        deal: Raw deal data from HubSpot API
-        scan_id: Extraction scan identifier
-        tenant_id: Tenant identifier
+        value: Raw property value
     
     Returns:
-        Transformed deal record
+        Parsed datetime, or None if the value is missing or invalid
     """
-    deal_id = deal.get("id")
-    properties = deal.get("properties", {})
+    if not value:
+        return None
     
-    # Extract timestamps
-    created_at = None
-    updated_at = None
+    try:
+        if isinstance(value, int) or value.isdigit():
+            return _EPOCH + timedelta(milliseconds=int(value))
+        return datetime.fromisoformat(value)
+    except (ValueError, TypeError, AttributeError, OverflowError):
+        return None
+
+
+def parse_hubspot_amount(value: Any) -> Optional[float]:
+    """Convert a HubSpot amount property to a float, or None if invalid"""
+    if not value:
+        return None
     
-    if "createdate" in properties:
-        try:
-            created_at = datetime.fromtimestamp(int(properties["createdate"]) / 1000)
-        except (ValueError, TypeError):
-            pass
+    try:
+        return float(value)
+    except (ValueError, TypeError):
+        return None
+
+
+def _property_array(values: List[Any]) -> pa.Array:
+    """
+    Build the Arrow column for one flattened HubSpot property
     
-    if "hs_lastmodifieddate" in properties:
+    Mirrors how DLT typed these columns when deals were loaded as dicts:
+    ISO 8601 date-times become timestamps (DLT's iso_timestamp detection),
+    everything else stays text.
+    """
+    present = [value for value in values if value is not None]
+    if all(isinstance(value, str) and len(value) > 10 for value in present):
         try:
-            updated_at = datetime.fromtimestamp(int(properties["hs_lastmodifieddate"]) / 1000)
-        except (ValueError, TypeError):
+            return pa.array(
+                [datetime.fromisoformat(value) if value is not None else None for value in values],
+                _TIMESTAMP
+            )
+        except ValueError:
             pass
     
-    # Transform amount to numeric
-    amount = None
-    if "amount" in properties and properties["amount"]:
-        try:
-            amount = float(properties["amount"])
-        except (ValueError, TypeError):
-            pass
+    return pa.array(
+        [value if value is None or isinstance(value, str) else str(value) for value in values],
+        pa.string()
+    )
+
+
+def transform_deal_page(
+    deals: List[Dict[str, Any]],
+    scan_id: str,
+    tenant_id: str
+) -> pa.Table:
+    """
+    Transform a page of HubSpot deals to an Arrow table in our database schema
+    
+    Columns are built once per page with explicit types, so DLT loads the
+    batch without normalizing each row. All records in the page share one
+    extraction timestamp. Raw properties become properties_json__<name>
+    columns, matching the table DLT created from dict rows; properties
+    that are null for every deal in the page are left out, as DLT did.
     
-    # Build record
-    record = {
-        "deal_id": deal_id,
-        "tenant_id": tenant_id,
-        "scan_id": scan_id,
-        "extracted_at": datetime.utcnow(),
+    Args:
+        deals: Raw deal data from a HubSpot API page
+        scan_id: Extraction scan identifier
+        tenant_id: Tenant identifier
+    
+    Returns:
+        Arrow table with one row per deal
+    """
+    count = len(deals)
+    properties = [deal.get("properties") or {} for deal in deals]
+    
+    def _column(name: str) -> List[Any]:
+        return [props.get(name) for props in properties]
+    
+    arrays = [
+        pa.array([deal.get("id") for deal in deals], pa.string()),
+        pa.array([tenant_id] * count, pa.string()),
+        pa.array([scan_id] * count, pa.string()),
+        pa.array([datetime.now(timezone.utc)] * count, _TIMESTAMP),
         
         # Deal properties
-        "deal_name": properties.get("dealname"),
-        "amount": amount,
-        "deal_stage": properties.get("dealstage"),
-        "pipeline": properties.get("pipeline"),
-        "close_date": properties.get("closedate"),
-        "description": properties.get("description"),
-        "deal_type": properties.get("dealtype"),
+        pa.array(_column("dealname"), pa.string()),
+        pa.array([parse_hubspot_amount(value) for value in _column("amount")], pa.float64()),
+        pa.array(_column("dealstage"), pa.string()),
+        pa.array(_column("pipeline"), pa.string()),
+        pa.array(_column("closedate"), pa.string()),
+        pa.array(_column("description"), pa.string()),
+        pa.array(_column("dealtype"), pa.string()),
         
         # Timestamps
-        "created_at": created_at,
-        "updated_at": updated_at,
-        "archived": deal.get("archived", False),
-        
-        # Store all properties as JSON for flexibility
-        "properties_json": properties
-    }
+        pa.array([parse_hubspot_timestamp(value) for value in _column("createdate")], _TIMESTAMP),
+        pa.array([parse_hubspot_timestamp(value) for value in _column("hs_lastmodifieddate")], _TIMESTAMP),
+        pa.array([deal.get("archived", False) for deal in deals], pa.bool_()),
+    ]
+    fields = list(_DEAL_FIELDS)
     
-    return record
-
+    # Flattened raw properties, in first-seen order
+    names: Dict[str, None] = {}
+    for props in properties:
+        for name, value in props.items():
+            if value is not None:
+                names.setdefault(name)
+    
+    for name in names:
+        array = _property_array(_column(name))
+        arrays.append(array)
+        fields.append(pa.field(_PROPERTIES_PREFIX + name, array.type))
+    
+    return pa.Table.from_arrays(arrays, schema=pa.schema(fields))
@@ -3,29 +3,184 @@ Extraction Service
 Orchestrates the ETL process using DLT
 """
 import dlt
+import orjson
 import logging
 import asyncio
-from typing import Optional, Dict, Any, List
+from typing import Optional, Dict, Any, List, NamedTuple
 from datetime import datetime
-import uuid
-from concurrent.futures import ThreadPoolExecutor
+import hashlib
+from redis.asyncio import Redis
 
 from config.settings import get_settings
 from services.data_source import hubspot_deals_resource
-import os
+from utils.identifiers import uuid7
 
 logger = logging.getLogger(__name__)
 
-# Store extraction statuses (in production, use Redis or database)
-extraction_statuses: Dict[str, Dict[str, Any]] = {}
+
+class StatusUpdate(NamedTuple):
+    """Patch to an extraction status, applied by the status writer"""
+    scan_id: str
+    patch: Dict[str, Any]
+    done: Optional[asyncio.Future] = None
 
 
 class ExtractionService:
     """Service for managing extraction processes"""
     
-    def __init__(self):
+    def __init__(self, redis: Optional[Redis] = None):
+        """
+        Initialize extraction service
+        
+        Args:
+            redis: Redis client used to store extraction statuses
+                (created from settings when not provided)
+        """
         self.settings = get_settings()
-        self.executor = ThreadPoolExecutor(max_workers=5)
+        self.redis = redis or Redis.from_url(self.settings.redis_url)
+        
+        # Configure the DLT pipeline once; runs share its working state, so
+        # they are serialized through a lock
+        self._pipeline = dlt.pipeline(
+            pipeline_name=self.settings.dlt_pipeline_name,
+            destination=dlt.destinations.postgres(
+                credentials=self.settings.resolved_database_url
+            ),
+            dataset_name=self.settings.dlt_database_schema
+        )
+        self._pipeline_lock = asyncio.Lock()
+        
+        # In-flight extractions keyed by request signature, so duplicate
+        # requests share one scan instead of hitting HubSpot twice
+        self._inflight: Dict[str, asyncio.Future] = {}
+        self._tasks: set = set()
+        self._loading: set = set()
+        
+        # Status patches are applied by a single writer coroutine
+        self._status_queue: asyncio.Queue = asyncio.Queue()
+        self._status_writer: Optional[asyncio.Task] = None
+    
+    async def aclose(self):
+        """Stop extractions, flush status updates and stop the writer"""
+        # Extractions publish their final status as they finish, so they must
+        # all be done before the queue is drained. Queued ones are cancelled;
+        # one already loading cannot be interrupted (the pipeline runs in a
+        # worker thread), so give it a chance to finish and report its result.
+        tasks = list(self._tasks)
+        loading = [task for task in tasks if task in self._loading]
+        for task in tasks:
+            if task not in self._loading:
+                task.cancel()
+        
+        if loading:
+            _, pending = await asyncio.wait(
+                loading,
+                timeout=self.settings.extraction_shutdown_timeout
+            )
+            for task in pending:
+                task.cancel()
+        
+        await asyncio.gather(*tasks, return_exceptions=True)
+        
+        if self._status_writer is None:
+            return
+        
+        await self._status_queue.join()
+        self._status_writer.cancel()
+        try:
+            await self._status_writer
+        except asyncio.CancelledError:
+            pass
+        self._status_writer = None
+    
+    @staticmethod
+    def _status_key(scan_id: str) -> str:
+        """Redis key holding the status of an extraction"""
+        return f"scan:{scan_id}"
+    
+    async def _load_status(self, scan_id: str) -> Optional[Dict[str, Any]]:
+        """Load an extraction status, or None if it is unknown or expired"""
+        raw = await self.redis.get(self._status_key(scan_id))
+        return orjson.loads(raw) if raw is not None else None
+    
+    async def _publish_status(
+        self,
+        scan_id: str,
+        patch: Dict[str, Any],
+        wait: bool = False
+    ):
+        """
+        Queue a patch to an extraction status
+        
+        Args:
+            scan_id: Extraction scan identifier
+            patch: Fields to merge into the stored status
+            wait: Whether to wait until the patch has been written
+        """
+        if self._status_writer is None or self._status_writer.done():
+            self._status_writer = asyncio.create_task(self._write_statuses())
+        
+        done = asyncio.get_running_loop().create_future() if wait else None
+        self._status_queue.put_nowait(StatusUpdate(scan_id, patch, done))
+        
+        if done is not None:
+            await done
+    
+    async def _write_statuses(self):
+        """Single writer applying queued status patches in order"""
+        while True:
+            batch = [await self._status_queue.get()]
+            while not self._status_queue.empty():
+                batch.append(self._status_queue.get_nowait())
+            
+            try:
+                await self._apply_status_updates(batch)
+            except Exception as e:
+                logger.error(f"Failed to write extraction statuses: {str(e)}")
+                for update in batch:
+                    if update.done is not None and not update.done.done():
+                        update.done.set_exception(e)
+            else:
+                for update in batch:
+                    if update.done is not None and not update.done.done():
+                        update.done.set_result(None)
+            finally:
+                for _ in batch:
+                    self._status_queue.task_done()
+    
+    async def _apply_status_updates(self, batch: List[StatusUpdate]):
+        """Merge a batch of patches into Redis with one read and one write"""
+        patches: Dict[str, List[Dict[str, Any]]] = {}
+        for update in batch:
+            patches.setdefault(update.scan_id, []).append(update.patch)
+        
+        scan_ids = list(patches)
+        stored = await self.redis.mget([self._status_key(scan_id) for scan_id in scan_ids])
+        
+        async with self.redis.pipeline(transaction=False) as pipe:
+            for scan_id, raw in zip(scan_ids, stored):
+                status = orjson.loads(raw) if raw is not None else {"scan_id": scan_id}
+                for patch in patches[scan_id]:
+                    status.update(patch)
+                pipe.set(
+                    self._status_key(scan_id),
+                    orjson.dumps(status, default=str),
+                    ex=self.settings.extraction_status_ttl
+                )
+            await pipe.execute()
+    
+    @staticmethod
+    def _request_key(
+        access_token: str,
+        tenant_id: str,
+        properties: Optional[List[str]]
+    ) -> str:
+        """Signature identifying equivalent extraction requests"""
+        props = "\x1f".join(sorted(properties)) if properties is not None else "\x00"
+        return hashlib.blake2b(
+            f"{access_token}\x1e{tenant_id}\x1e{props}".encode(),
+            digest_size=16
+        ).hexdigest()
     
     async def start_extraction(
         self,
@@ -40,84 +195,118 @@ class ExtractionService:
         Args:
             access_token: HubSpot access token
             tenant_id: Tenant identifier
-            limit: Optional limit on number of records
+            limit: Optional number of deals requested per HubSpot page
             properties: Optional list of properties to extract
         
         Returns:
             scan_id: Unique identifier for this extraction
         """
-        scan_id = str(uuid.uuid4())
+        # Reuse an identical extraction that is still running; the future
+        # resolves to its scan_id once the initial status has been written
+        key = self._request_key(access_token, tenant_id, properties)
+        pending = self._inflight.get(key)
+        if pending is not None:
+            scan_id = await asyncio.shield(pending)
+            logger.info(f"Reusing in-flight extraction - scan_id: {scan_id}")
+            return scan_id
         
-        # Initialize status
-        extraction_statuses[scan_id] = {
-            "scan_id": scan_id,
-            "status": "running",
-            "started_at": datetime.utcnow().isoformat(),
-            "progress": {
-                "pages_processed": 0,
-                "records_processed": 0
-            },
-            "error": None
-        }
+        started = asyncio.get_running_loop().create_future()
+        self._inflight[key] = started
+        scan_id = str(uuid7())
+        
+        try:
+            # Initialize status; the scan stays queued until it holds the
+            # pipeline lock
+            await self._publish_status(scan_id, {
+                "scan_id": scan_id,
+                "status": "queued",
+                "queued_at": datetime.utcnow().isoformat(),
+                "started_at": None,
+                "progress": {
+                    "pages_processed": 0,
+                    "records_processed": 0
+                },
+                "error": None
+            }, wait=True)
+        except asyncio.CancelledError:
+            self._inflight.pop(key, None)
+            started.cancel()
+            raise
+        except Exception as e:
+            self._inflight.pop(key, None)
+            started.set_exception(e)
+            # Mark the exception retrieved in case no duplicate is waiting
+            started.exception()
+            raise
         
         # Run extraction in background
-        asyncio.create_task(self._run_extraction(
+        task = asyncio.create_task(self._run_extraction(
             scan_id=scan_id,
             access_token=access_token,
             tenant_id=tenant_id,
-            properties=properties
+            properties=properties,
+            page_size=limit or 100
         ))
+        self._tasks.add(task)
+        task.add_done_callback(lambda t: self._finish_task(key, t))
+        started.set_result(scan_id)
         
         logger.info(f"Started extraction - scan_id: {scan_id}")
         return scan_id
     
+    def _finish_task(self, key: str, task: asyncio.Task):
+        """Forget a finished extraction task"""
+        self._inflight.pop(key, None)
+        self._tasks.discard(task)
+    
     async def _run_extraction(
         self,
         scan_id: str,
         access_token: str,
         tenant_id: str,
-        properties: Optional[List[str]] = None
+        properties: Optional[List[str]] = None,
+        page_size: int = 100
     ):
         """Run the extraction process"""
+        started_at = None
         try:
-            # Ensure DATABASE_URL is set for DLT
-            if not os.environ.get("DATABASE_URL") and not self.settings.database_url:
-                # Construct from components if not set
-                db_url = (
-                    f"postgresql://{self.settings.db_user}:{self.settings.db_password}"
-                    f"@{self.settings.db_host}:{self.settings.db_port}/{self.settings.db_name}"
-                )
-                os.environ["DATABASE_URL"] = db_url
-            elif self.settings.database_url:
-                os.environ["DATABASE_URL"] = self.settings.database_url
-            
-            # Configure DLT pipeline
-            # DLT will read database credentials from DATABASE_URL environment variable
-            pipeline = dlt.pipeline(
-                pipeline_name=self.settings.dlt_pipeline_name,
-                destination="postgres",
-                dataset_name=self.settings.dlt_database_schema
-            )
-            
             # Create data source
             deals_data = hubspot_deals_resource(
                 access_token=access_token,
                 tenant_id=tenant_id,
                 properties=properties,
                 archived=False,
-                checkpoint_interval=10
+                checkpoint_interval=10,
+                scan_id=scan_id,
+                page_size=page_size
             )
             
-            # Run the pipeline
-            load_info = pipeline.run(deals_data)
+            # Run the pipeline off the event loop; DLT evaluates the async
+            # resource itself
+            async with self._pipeline_lock:
+                started_at = datetime.utcnow().isoformat()
+                await self._publish_status(scan_id, {
+                    "status": "running",
+                    "started_at": started_at
+                })
+                task = asyncio.current_task()
+                self._loading.add(task)
+                try:
+                    load_info = await asyncio.to_thread(self._pipeline.run, deals_data)
+                finally:
+                    self._loading.discard(task)
             
             # Update status
-            extraction_statuses[scan_id].update({
+            await self._publish_status(scan_id, {
                 "status": "completed",
                 "completed_at": datetime.utcnow().isoformat(),
                 "load_info": {
-                    "tables": list(load_info.keys()) if load_info else [],
-                    "jobs": [job.asdict() for job in load_info.get("jobs", [])] if load_info else []
+                    "load_ids": list(load_info.loads_ids),
+                    "tables": sorted({
+                        job.job_file_info.table_name
+                        for package in load_info.load_packages
+                        for job in package.jobs.get("completed_jobs", [])
+                    })
                 }
             })
             
@@ -125,11 +314,29 @@ class ExtractionService:
             
         except Exception as e:
             logger.error(f"Extraction failed - scan_id: {scan_id}, error: {str(e)}")
-            extraction_statuses[scan_id].update({
+            await self._publish_status(scan_id, {
                 "status": "failed",
                 "completed_at": datetime.utcnow().isoformat(),
                 "error": str(e)
             })
+        except asyncio.CancelledError:
+            if started_at is None:
+                logger.warning(f"Extraction cancelled before starting - scan_id: {scan_id}")
+                await self._publish_status(scan_id, {
+                    "status": "cancelled",
+                    "completed_at": datetime.utcnow().isoformat(),
+                    "error": "Extraction cancelled during service shutdown before it started"
+                })
+            else:
+                logger.warning(f"Extraction interrupted - scan_id: {scan_id}")
+                await self._publish_status(scan_id, {
+                    "status": "interrupted",
+                    "error": (
+                        "Service shut down before the load finished; "
+                        "the load may still have completed"
+                    )
+                })
+            raise
     
     async def get_extraction_status(self, scan_id: str) -> Dict[str, Any]:
         """
@@ -141,10 +348,11 @@ class ExtractionService:
         Returns:
             Status information
         """
-        if scan_id not in extraction_statuses:
+        status = await self._load_status(scan_id)
+        if status is None:
             raise ValueError(f"Extraction {scan_id} not found")
         
-        return extraction_statuses[scan_id]
+        return status
     
     async def get_extraction_results(
         self,
@@ -3,8 +3,12 @@ HubSpot API Service
 Handles authentication and API calls to HubSpot CRM API v3
 """
 import httpx
+import orjson
 import logging
 import time
+import asyncio
+import random
+from collections import deque
 from typing import Optional, Dict, Any, List
 from datetime import datetime
 
@@ -12,6 +16,12 @@ from config.settings import get_settings
 
 logger = logging.getLogger(__name__)
 
+# Deal properties retrieved when the caller does not specify any
+DEFAULT_DEAL_PROPERTIES = (
+    "dealname", "amount", "dealstage", "pipeline", "closedate",
+    "createdate", "hs_lastmodifieddate", "description", "dealtype"
+)
+
 
 class HubSpotAPIError(Exception):
     """Custom exception for HubSpot API errors"""
@@ -20,7 +30,10 @@ class HubSpotAPIError(Exception):
 
 class RateLimitError(HubSpotAPIError):
     """Exception for rate limit errors"""
-    pass
+    
+    def __init__(self, message: str, retry_after: Optional[float] = None):
+        super().__init__(message)
+        self.retry_after = retry_after
 
 
 class HubSpotAPIService:
@@ -41,44 +54,107 @@ class HubSpotAPIService:
         # Rate limiting: HubSpot allows 150 requests per 10 seconds
         self.rate_limit_requests = 150
         self.rate_limit_window = 10  # seconds
-        self.request_times = []
+        self.request_times: deque = deque()
+        self._rate_limit_lock = asyncio.Lock()
+        
+        # Pre-joined "properties" query values, keyed by property tuple
+        self._default_properties_param = ",".join(DEFAULT_DEAL_PROPERTIES)
+        self._properties_cache: Dict[tuple, str] = {}
+        
+        # Retry policy for 429 responses (exponential backoff with jitter)
+        self.max_retries = 5
+        self.backoff_base = 1.0  # seconds
         
         # Headers
         self.headers = {
             "Authorization": f"Bearer {self.access_token}",
-            "Content-Type": "application/json"
+            "Content-Type": "application/json",
+            "Accept-Encoding": "gzip"
         }
+        
+        # Shared client so paginated calls reuse pooled keep-alive connections
+        self._client = httpx.AsyncClient(
+            base_url=self.base_url,
+            headers=self.headers,
+            timeout=self.timeout,
+            http2=True,
+            limits=httpx.Limits(max_keepalive_connections=64, max_connections=64)
+        )
     
-    def _check_rate_limit(self):
-        """Check and enforce rate limiting"""
-        current_time = time.time()
-        
-        # Remove requests older than the rate limit window
-        self.request_times = [
-            req_time for req_time in self.request_times
-            if current_time - req_time < self.rate_limit_window
-        ]
-        
-        # If we've hit the limit, wait until we can make another request
-        if len(self.request_times) >= self.rate_limit_requests:
-            sleep_time = self.rate_limit_window - (current_time - self.request_times[0]) + 0.1
-            if sleep_time > 0:
-                logger.warning(f"Rate limit reached. Sleeping for {sleep_time:.2f} seconds")
-                time.sleep(sleep_time)
-                # Clean up again after sleep
-                self.request_times = [
-                    req_time for req_time in self.request_times
-                    if time.time() - req_time < self.rate_limit_window
-                ]
-        
-        # Record this request
-        self.request_times.append(current_time)
+    async def aclose(self):
+        """Close the underlying HTTP client and its pooled connections"""
+        await self._client.aclose()
+    
+    def _evict_expired(self, current_time: float):
+        """Drop request timestamps that fell out of the rate limit window"""
+        while self.request_times and current_time - self.request_times[0] >= self.rate_limit_window:
+            self.request_times.popleft()
+    
+    async def _check_rate_limit(self):
+        """Check and enforce rate limiting without blocking the event loop"""
+        async with self._rate_limit_lock:
+            current_time = time.monotonic()
+            self._evict_expired(current_time)
+            
+            # If we've hit the limit, wait until the oldest request expires
+            if len(self.request_times) >= self.rate_limit_requests:
+                sleep_time = self.rate_limit_window - (current_time - self.request_times[0]) + 0.1
+                if sleep_time > 0:
+                    logger.warning(f"Rate limit reached. Sleeping for {sleep_time:.2f} seconds")
+                    await asyncio.sleep(sleep_time)
+                current_time = time.monotonic()
+                self._evict_expired(current_time)
+            
+            # Record this request
+            self.request_times.append(current_time)
+    
+    def _backoff_delay(self, attempt: int, response: httpx.Response) -> float:
+        """Compute the delay before retrying a rate limited request"""
+        delay = self.backoff_base * 2 ** attempt + random.random()
+        try:
+            retry_after = float(response.headers.get("Retry-After", 0))
+        except ValueError:
+            retry_after = 0
+        return max(delay, retry_after)
+    
+    async def _get(self, path: str, params: Dict[str, Any]) -> httpx.Response:
+        """
+        Perform a rate limited GET request, retrying on 429 responses
+        
+        Args:
+            path: API path relative to the base URL
+            params: Query parameters
+        
+        Returns:
+            The final HTTP response
+        """
+        attempt = 0
+        while True:
+            await self._check_rate_limit()
+            response = await self._client.get(path, params=params)
+            
+            if response.status_code != 429 or attempt >= self.max_retries:
+                return response
+            
+            delay = self._backoff_delay(attempt, response)
+            logger.warning(
+                f"Rate limited by HubSpot (attempt {attempt + 1}/{self.max_retries}). "
+                f"Retrying in {delay:.2f} seconds"
+            )
+            await asyncio.sleep(delay)
+            attempt += 1
     
     def _handle_error(self, response: httpx.Response):
         """Handle API errors"""
         if response.status_code == 429:
-            retry_after = int(response.headers.get("Retry-After", 10))
-            raise RateLimitError(f"Rate limit exceeded. Retry after {retry_after} seconds")
+            try:
+                retry_after = float(response.headers.get("Retry-After", 10))
+            except ValueError:
+                retry_after = 10.0
+            raise RateLimitError(
+                f"Rate limit exceeded. Retry after {retry_after:g} seconds",
+                retry_after=retry_after
+            )
         elif response.status_code == 401:
             raise HubSpotAPIError("Authentication failed. Check your access token.")
         elif response.status_code == 403:
@@ -96,19 +172,19 @@ class HubSpotAPIService:
         """
         try:
             # Make a simple API call to validate credentials
-            async with httpx.AsyncClient(timeout=self.timeout) as client:
-                response = await client.get(
-                    f"{self.base_url}/crm/v3/objects/deals",
-                    headers=self.headers,
-                    params={"limit": 1}
-                )
-                
-                if response.status_code == 200:
-                    logger.info("HubSpot credentials validated successfully")
-                    return True
-                else:
-                    self._handle_error(response)
-                    return False
+            response = await self._get(
+                "/crm/v3/objects/deals",
+                params={"limit": 1}
+            )
+            
+            if response.status_code == 200:
+                logger.info("HubSpot credentials validated successfully")
+                return True
+            else:
+                self._handle_error(response)
+                return False
+        except HubSpotAPIError:
+            raise
         except Exception as e:
             logger.error(f"Error validating credentials: {str(e)}")
             raise HubSpotAPIError(f"Failed to validate credentials: {str(e)}")
@@ -132,15 +208,6 @@ class HubSpotAPIService:
         Returns:
             Dictionary with deals data and pagination info
         """
-        self._check_rate_limit()
-        
-        # Default properties to retrieve
-        if properties is None:
-            properties = [
-                "dealname", "amount", "dealstage", "pipeline", "closedate",
-                "createdate", "hs_lastmodifieddate", "description", "dealtype"
-            ]
-        
         params = {
             "limit": min(limit, 100),  # HubSpot max is 100
             "archived": str(archived).lower()
@@ -149,23 +216,31 @@ class HubSpotAPIService:
         if after:
             params["after"] = after
         
-        if properties:
-            params["properties"] = ",".join(properties)
+        # Default properties to retrieve
+        if properties is None:
+            params["properties"] = self._default_properties_param
+        elif properties:
+            key = tuple(properties)
+            properties_param = self._properties_cache.get(key)
+            if properties_param is None:
+                properties_param = self._properties_cache[key] = ",".join(properties)
+            params["properties"] = properties_param
         
         try:
-            async with httpx.AsyncClient(timeout=self.timeout) as client:
-                response = await client.get(
-                    f"{self.base_url}/crm/v3/objects/deals",
-                    headers=self.headers,
-                    params=params
-                )
-                
-                if response.status_code == 200:
-                    data = response.json()
-                    logger.info(f"Retrieved {len(data.get('results', []))} deals")
-                    return data
-                else:
-                    self._handle_error(response)
+            response = await self._get(
+                "/crm/v3/objects/deals",
+                params=params
+            )
+            
+            if response.status_code == 200:
+                # Parse the decompressed bytes directly, skipping a str decode
+                data = orjson.loads(response.content)
+                logger.info(f"Retrieved {len(data.get('results', []))} deals")
+                return data
+            else:
+                self._handle_error(response)
+        except HubSpotAPIError:
+            raise
         except httpx.TimeoutException:
             raise HubSpotAPIError("Request timeout. HubSpot API did not respond in time.")
         except httpx.RequestError as e:
@@ -178,41 +253,76 @@ class HubSpotAPIService:
         self,
         properties: Optional[List[str]] = None,
         archived: bool = False,
-        max_pages: Optional[int] = None
+        max_pages: Optional[int] = None,
+        prefetch_pages: int = 4,
+        page_size: int = 100
     ):
         """
         Generator that yields all deals with pagination
         
+        Pages are fetched by a background producer task into a bounded queue,
+        so the next request is already in flight while the caller processes
+        the current page.
+        
         Args:
             properties: List of deal properties to retrieve
             archived: Whether to include archived deals
             max_pages: Maximum number of pages to fetch (None for all)
+            prefetch_pages: Maximum number of pages buffered ahead of the caller
+            page_size: Number of deals requested per page (max: 100)
         
         Yields:
             Dictionary with deals data for each page
         """
-        page_count = 0
-        after = None
+        queue: asyncio.Queue = asyncio.Queue(maxsize=max(1, prefetch_pages))
+        done = object()
         
-        while True:
-            if max_pages and page_count >= max_pages:
-                break
-            
-            response_data = await self.get_deals(
-                limit=100,
-                after=after,
-                properties=properties,
-                archived=archived
-            )
-            
-            yield response_data
-            
-            # Check if there are more pages
-            paging = response_data.get("paging", {})
-            after = paging.get("next", {}).get("after")
+        async def _produce():
+            page_count = 0
+            after = None
             
-            if not after:
-                break
-            
-            page_count += 1
-
+            try:
+                while True:
+                    if max_pages and page_count >= max_pages:
+                        break
+                    
+                    response_data = await self.get_deals(
+                        limit=page_size,
+                        after=after,
+                        properties=properties,
+                        archived=archived
+                    )
+                    
+                    await queue.put(response_data)
+                    
+                    # Check if there are more pages
+                    paging = response_data.get("paging", {})
+                    after = paging.get("next", {}).get("after")
+                    
+                    if not after:
+                        break
+                    
+                    page_count += 1
+            except Exception as e:
+                await queue.put(e)
+            else:
+                await queue.put(done)
+        
+        producer = asyncio.create_task(_produce())
+        
+        try:
+            while True:
+                item = await queue.get()
+                if item is done:
+                    break
+                if isinstance(item, Exception):
+                    raise item
+                yield item
+        finally:
+            if not producer.done():
+                producer.cancel()
+                # Wait for the producer so no request outlives the generator
+                try:
+                    await producer
+                except asyncio.CancelledError:
+                    pass
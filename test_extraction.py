@@ -39,6 +39,7 @@ async def test_hubspot_api():
         if deals:
             print(f"Sample deal: {deals[0].get('properties', {}).get('dealname', 'N/A')}")
         
+        await api_service.aclose()
         return True
         
     except Exception as e:
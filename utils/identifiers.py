@@ -0,0 +1,26 @@
+"""
+Identifier utilities
+"""
+import os
+import time
+import uuid
+
+
+def uuid7() -> uuid.UUID:
+    """
+    Generate a time-ordered UUID (version 7, RFC 9562)
+    
+    The leading 48 bits hold the Unix timestamp in milliseconds, so IDs
+    generated later sort later and land in adjacent index pages.
+    
+    Returns:
+        A new version 7 UUID
+    """
+    unix_ts_ms = time.time_ns() // 1_000_000
+    value = (unix_ts_ms & 0xFFFF_FFFF_FFFF) << 80
+    value |= int.from_bytes(os.urandom(10), "big")
+    
+    # Version (0b0111) and RFC 4122 variant (0b10) bits
+    value = (value & ~(0xF << 76)) | (0x7 << 76)
+    value = (value & ~(0x3 << 62)) | (0x2 << 62)
+    return uuid.UUID(int=value)